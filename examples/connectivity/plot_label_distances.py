@@ -2,7 +2,7 @@
 
 """Script to plot label distances on circle and connectome plots."""
 
-import mne
+import numpy as np
 from mne.datasets import sample
 
 from jumeg import get_jumeg_path
@@ -10,6 +10,11 @@ from jumeg.connectivity import (get_label_distances,
                                 plot_grouped_connectivity_circle)
 import yaml
 
+try:
+    from yaml import CSafeLoader as _YLoader
+except ImportError:
+    from yaml import SafeLoader as _YLoader
+
 from nilearn import plotting
 
 data_path = sample.data_path()
@@ -22,11 +27,11 @@ yaml_cortex_fname = get_jumeg_path() + '/data/desikan_%s_cortex_based_grouping.y
 
 labels_fname = get_jumeg_path() + '/data/desikan_label_names.yaml'
 with open(labels_fname, 'r') as f:
-    label_names = yaml.safe_load(f)['label_names']
+    label_names = yaml.load(f, Loader=_YLoader)['label_names']
 
 replacer_dict_fname = get_jumeg_path() + '/data/replacer_dictionaries.yaml'
 with open(replacer_dict_fname, 'r') as f:
-    replacer_dict = yaml.safe_load(f)['replacer_dict_%s' % parc]
+    replacer_dict = yaml.load(f, Loader=_YLoader)['replacer_dict_%s' % parc]
 
 # compute distances between center of masses (COMs) of the labels
 # we also get the MNI coordinates of the COMs in millimetres
@@ -34,7 +39,7 @@ con, coords, _, _ = get_label_distances(subject, subjects_dir, parc=parc)
 
 # forget long range connections, plot short neighbouring connections
 neighbor_range = 30.  # millimetres
-con[con > neighbor_range] = 0.
+np.multiply(con, con <= neighbor_range, out=con)
 
 cortex_colors = ['m', 'b', 'y', 'c', 'r', 'g',
                  'g', 'r', 'c', 'y', 'b', 'm']
@@ -48,8 +53,10 @@ plot_grouped_connectivity_circle(yaml_cortex_fname, con, label_names,
                                  n_lines=None, colorbar=True,
                                  colormap='Reds')
 
-# compute the degree
-degs = mne.connectivity.degree(con, threshold_prop=1)
+# compute the degree, i.e., the number of remaining connections per label
+# (same as mne.connectivity.degree(con, threshold_prop=1), con is symmetric
+# with zero diagonal)
+degs = np.count_nonzero(con, axis=0).astype(float)
 
 # show the label ROIs and short range connections using nilearn glass brain
 fig = plotting.plot_connectome(con, coords, node_size=degs,
@@ -14,14 +14,62 @@
 # Updates
 #--------------------------------------------
 
-import os,sys,yaml,argparse,glob
+import os,sys,yaml,argparse,logging
+from functools          import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from jumeg.base            import jumeg_logger
 from jumeg.base.jumeg_base import jumeg_base as jb
 
+#--- use the libyaml C parser if available
+try:
+   from yaml import CSafeLoader as _YLoader
+except ImportError:
+   from yaml import SafeLoader as _YLoader
+
 logger = jumeg_logger.get_logger()
 
 __version__="2020.04.22.001"
 
+@lru_cache(maxsize=1024)
+def _expand(v):
+    """ expand user and env vars in path, cached: ENVs are static for a pipeline run """
+    return os.path.expandvars( os.path.expanduser(v) )
+
+def _iter_matches(root,suffixes,recursive=False):
+    """
+    yield full path of files in <root> ending with one of the <suffixes>
+    single os.scandir pass per directory, hidden files and dirs are skipped like glob does
+    symlinked dirs are followed like glob does, each dir is scanned once (st_dev,st_ino)
+    to avoid loops
+    
+    :param root     : start dir
+    :param suffixes : tuple of file extentions
+    :param recursive: search in subdirs <False>
+    :return:
+     generator of file paths
+    """
+    stack = [root]
+    seen  = set()
+    while stack:
+        d = stack.pop()
+        try:
+            st = os.stat(d)
+            if (st.st_dev,st.st_ino) in seen:
+               continue
+            seen.add( (st.st_dev,st.st_ino) )
+            
+            with os.scandir(d) as it:
+                 for e in it:
+                     if e.name.startswith("."):
+                        continue
+                     if e.is_dir():
+                        if recursive:
+                           stack.append(e.path)
+                     elif e.name.endswith(suffixes) and e.is_file():
+                        yield e.path
+        except OSError as err:
+            logger.warning("can not scan dir: {}\n  -> {}".format(d,err))
+
 class JuMEG_PDF_BASE(object):
    def __init__(self,**kwargs):
        self._stage  = "."
@@ -31,6 +79,7 @@ class JuMEG_PDF_BASE(object):
        self.debug   = False
        
        self._file_extention = ["meeg-raw.fif","rfDC-empty.fif"]
+       self._suffix_tuple   = tuple(self._file_extention)
 
    @property
    def ExitOnError(self):
@@ -45,10 +94,19 @@ class JuMEG_PDF_BASE(object):
    def file_extention(self,v):
        if not v:
           self._file_extention = []
-       elif not isinstance(v,(list)):
-          self._file_extention = list(v)
-       else:
+       elif type(v) is list:
           self._file_extention = v
+       elif isinstance(v,str):
+          self._file_extention = v.split(",")
+       else:
+          self._file_extention = list(v)
+       self._file_extention = [ sys.intern(x) for x in self._file_extention ]
+       self._suffix_tuple   = tuple(self._file_extention)
+
+   @property
+   def file_suffixes(self):
+       """ file extentions as tuple, ready to use with str.endswith """
+       return self._suffix_tuple
 
    @property
    def pdfs(self): return self._pdfs
@@ -78,7 +136,7 @@ class JuMEG_PDF_BASE(object):
        
    def get_fullpath(self,v):
        if v:
-          return os.path.expandvars(os.path.expanduser(v))
+          return _expand(v)
        return None
    
    def clear(self):
@@ -105,11 +163,7 @@ class JuMEG_PDF_BASE(object):
        if file_extention:
           self.file_extention = file_extention
     
-       if self.file_extention:
-          for fext in self.file_extention:
-              if fname.endswith(fext):
-                 return True
-       return False
+       return fname.endswith(self.file_suffixes)
     
 class JuMEG_PDF_IDS(JuMEG_PDF_BASE):
    '''
@@ -160,13 +214,15 @@ class JuMEG_PDF_IDS(JuMEG_PDF_BASE):
    def subjects(self): return self._ids
    @subjects.setter
    def subjects(self,v):
-       self._ids = []
-       if isinstance(v,(list)):
+       if not v:
+          self._ids = []
+       elif type(v) is list:
           self._ids = v
-       elif isinstance(v,(str)):
+       elif isinstance(v,str):
           self._ids = v.split(",")
-       elif v:
+       else:
           self._ids = list(v)
+       self._ids = [ sys.intern(str(x)) for x in self._ids ]
           
    def _update_from_kwargs(self,**kwargs):
        super()._update_from_kwargs(**kwargs)
@@ -176,6 +232,31 @@ class JuMEG_PDF_IDS(JuMEG_PDF_BASE):
        
        self.recursive = kwargs.get("recursive",self.recursive)
 
+   def _scan_subject(self,subj,suffixes):
+      """
+      find files in <stage/subject id> ending with one of the <suffixes>
+      
+      :param subj    : subject id
+      :param suffixes: tuple of file extentions
+      :return:
+       list of files
+      """
+      start_dir = None
+      try:
+     #--- check if its a dir
+         start_dir = os.path.abspath( os.path.join(self.stage,subj) )
+         if not os.path.isdir( start_dir ):
+            return []
+         if self.debug:
+            logger.debug("start dir     : %s\n  -> extention : %s\n  -> recursive : %s",
+                         start_dir,self.file_extention,self.recursive)
+        #--- one directory traversal per subject, match filenames against all extentions at once
+         return list( _iter_matches(start_dir,suffixes,self.recursive) )
+      except:
+         logger.exception("error subject : {}\n".format(subj) +
+                          "  -> start dir     : {}\n".format(start_dir) )
+      return []
+      
    def update(self,**kwargs):
       """
         loop over subjects dir find files matching one of the file extentions
@@ -184,7 +265,7 @@ class JuMEG_PDF_IDS(JuMEG_PDF_BASE):
         :param stage          : start dir,stage
         :param file_extention : string or list  <None>
                                 if <file_extention> checks filename extention ends with extentio from list
-        :param recursive      : recursive searching for files in subdirs of <stage/subject_id> using glob.iglob <False>
+        :param recursive      : recursive searching for files in subdirs of <stage/subject_id> <False>
         :return:
          file list
 
@@ -197,35 +278,15 @@ class JuMEG_PDF_IDS(JuMEG_PDF_BASE):
       if self.debug:
          self.info()
          
-      if self.recursive:
-         fpatt = '**/*'
-      else:
-         fpatt = '*'
-    
       self._pdfs = []
+      suffixes   = self.file_suffixes
       
-      for subj in self.subjects:
-          try:
-         #--- check if its a dir
-             start_dir = os.path.join(self.stage,subj)
-             if not os.path.isdir( start_dir ):
-                continue
-             # def find_files(start_dir=None,pattern=None,file_extention=None,debug=False)
-             with jb.working_directory(start_dir):
-                  for fext in self.file_extention:
-                      if self.debug:
-                         logger.debug( "start dir     : {}\n".format(start_dir)+
-                                        "  -> extention     : {}\n".format(fext)+
-                                        "  -> glob recursive: {}\n".format(self.recursive) +
-                                        "  -> glob pattern  : {}".format(fpatt)
-                                       )
-                           
-                      for f in glob.glob(fpatt + fext,recursive=self.recursive):
-                          self._pdfs.append( os.path.abspath( os.path.join(start_dir,f) ) )
-          except:
-              logger.exception("error subject : {}\n".format(subj) +
-                               "  -> start dir     : {}\n".format(start_dir) )
-      self._pdfs.sort()
+     #--- subject dirs are independent, scan them in parallel; os.scandir releases the GIL
+      if self.subjects:
+         with ThreadPoolExecutor(max_workers=min(32,len(self.subjects))) as ex:
+              for pdfs in ex.map(lambda subj: self._scan_subject(subj,suffixes),self.subjects):
+                  self._pdfs.extend(pdfs)
+      self._pdfs = sorted( dict.fromkeys(self._pdfs) )
       
       if self.debug:
          logger.debug("PDFs:\n  ->"+"\n  ->".join(self.pdfs) )
@@ -295,45 +356,48 @@ class JuMEG_PDF_LIST(JuMEG_PDF_BASE):
        self._update_from_kwargs(**kwargs)
        found_list = []
        try:
-           if not self.GetFullListFileName():
+           full_name = self.GetFullListFileName()
+           if not full_name:
               return None
            
-           if not os.path.isfile( self.GetFullListFileName() ):
+           if not os.path.isfile( full_name ):
               logger.exception("<list file> is not a file:\n  -> path: {}\n  -> file: {}".format(self.list_file_path,self.list_file_name))
               return None
             
            # if self.debug:
-           #    logger.info("  -> list file: {}".format( self.GetFullListFileName() ) )
-           with open(self.GetFullListFileName(),'r') as f:
-                for line in f:
-                    line = line.strip()
-                    fname = None
-                    if line:
-                       if (line[0] == '#'): continue
-                       fname = line.split()[0]
-                       try:
-                           if not self.check_file_extention(fname):
-                              msg= "ERROR wrong file extention: skip file !!!\n  -> file extention list: {}\n".format(self.file_extention)
-                              raise FileNotFoundError(msg)
-                           if self.stage:
-                              fname = os.path.abspath( os.path.join( self.stage+ "/" + fname ) )
-                           if not os.path.isfile(fname):
-                              raise FileNotFoundError("ERROR file is not a real file: skip file !!!")
-                              continue
-                           
-                           found_list.append(fname)
-                           
-                       except FileNotFoundError as e:
-                           msg = "\n".join([ e.args[0],
-                                            "  -> filename                  : {}".format(fname),
-                                            "  -> file extention expected   : {}".format(self.file_extention),
-                                            "  -> Exit On Error:            : {}\n".format(self.ExitOnError)])
+           #    logger.info("  -> list file: {}".format( full_name ) )
+           with open(full_name,'r') as f:
+                data = f.read()
+           fnames = [ line.split(None,1)[0] for line in ( l.strip() for l in data.splitlines() ) if line and not line.startswith('#') ]
+           if self.stage:
+              fnames = [ os.path.abspath( os.path.join(self.stage,fname) ) for fname in fnames ]
+          #--- stat calls release the GIL, check files in parallel
+           is_file = []
+           if fnames:
+              with ThreadPoolExecutor(max_workers=min(16,len(fnames))) as ex:
+                   is_file = list( ex.map(os.path.isfile,fnames) )
+           
+           for fname,ok in zip(fnames,is_file):
+               try:
+                   if not self.check_file_extention(fname):
+                      msg= "ERROR wrong file extention: skip file !!!\n  -> file extention list: {}\n".format(self.file_extention)
+                      raise FileNotFoundError(msg)
+                   if not ok:
+                      raise FileNotFoundError("ERROR file is not a real file: skip file !!!")
+                   
+                   found_list.append(fname)
+                   
+               except FileNotFoundError as e:
+                   msg = "\n".join([ e.args[0],
+                                    "  -> filename                  : {}".format(fname),
+                                    "  -> file extention expected   : {}".format(self.file_extention),
+                                    "  -> Exit On Error:            : {}\n".format(self.ExitOnError)])
     
-                           if self.ExitOnError:
-                              found_list.append(fname)
-                              logger.exception(msg)
-                           else:
-                              logger.warning(msg)
+                   if self.ExitOnError:
+                      found_list.append(fname)
+                      logger.exception(msg)
+                   else:
+                      logger.warning(msg)
                               
        except :
            msg="ERROR in file list; found files:\n  -> "+"\n  -> ".join(found_list)
@@ -345,7 +409,7 @@ class JuMEG_PDF_LIST(JuMEG_PDF_BASE):
            return False
         
        if self.debug:
-          logger.debug("PDF in list file: {}\n".format(self.GetFullListFileName() )+
+          logger.debug("PDF in list file: {}\n".format(full_name)+
                        "  -> counts : {}\n".format( len(found_list) )+
                        "  -> files  :\n    "+ "\n    ".join(found_list) )
        
@@ -383,7 +447,7 @@ class JuMEG_PDF_FILE(object):
     @path.setter
     def path(self,v):
         if v:
-            self._path = os.path.expandvars(os.path.expanduser(v))
+            self._path = _expand(v)
         else:
             self._path = v
     
@@ -405,6 +469,7 @@ class JuMEG_PDF_FILE(object):
 class JuMEG_PDF(object):
     def __init__(self):
         self._pdfs = []
+        self._meta = [] # (file,name,dir,id) for each PDF
         self._idx  = 0
 
     @property
@@ -422,10 +487,14 @@ class JuMEG_PDF(object):
     def pdfs(self,v):
         self._idx = 0
         if v:
-           self._pdfs = list( set(v) ) # kick off double PDFs
-           self._pdfs.sort()
+           self._pdfs = sorted( dict.fromkeys(v) ) # kick off double PDFs
         else:
            self._pdfs = []
+       #--- split paths once, not on every property access
+        self._meta = []
+        for f in self._pdfs:
+            name = os.path.basename(f)
+            self._meta.append( (f,name,os.path.dirname(f),name.split("_",1)[0]) )
         
     @property
     def current_number(self): return self._idx +1
@@ -440,20 +509,20 @@ class JuMEG_PDF(object):
 
     @property
     def name(self):
-        if self.counts:
-           return os.path.basename( self._pdfs[self._idx] )
+        if self._meta:
+           return self._meta[self._idx][1]
         return None
 
     @property
     def dir(self):
-        if self.counts:
-            return os.path.dirname(self._pdfs[self._idx])
+        if self._meta:
+           return self._meta[self._idx][2]
         return None
 
     @property
     def id(self):
-        if self.counts:
-           return self.name.split("_")[0]
+        if self._meta:
+           return self._meta[self._idx][3]
         return None
    
 class JuMEG_PipelineLooper(JuMEG_PDF_BASE):
@@ -513,7 +582,7 @@ class JuMEG_PipelineLooper(JuMEG_PDF_BASE):
         return self._config_file
     @config_file.setter
     def config_file(self,v):
-        self._config_file = os.path.expandvars( os.path.expanduser(v))
+        self._config_file = _expand(v)
     
     @property
     def subjects(self): return self._PDFIDS.subjects
@@ -539,6 +608,8 @@ class JuMEG_PipelineLooper(JuMEG_PDF_BASE):
     def file_extention(self,v):
         self._PDFIDS.file_extention  = v
         self._PDFList.file_extention = v
+    @property
+    def file_suffixes(self): return self._PDFIDS.file_suffixes
         
     def _update_from_kwargs(self,**kwargs):
         self._PDFIDS._update_from_kwargs(**kwargs)
@@ -565,14 +636,15 @@ class JuMEG_PipelineLooper(JuMEG_PDF_BASE):
      
     def _update_pdf_list(self):
         try:
-            self.pdf.pdfs = []
+            pdfs = []
             if self._PDFIDS.pdfs:
-               self.pdf.pdfs.extend(self._PDFIDS.pdfs)
+               pdfs.extend(self._PDFIDS.pdfs)
             if self._PDFList.pdfs:
-               self.pdf.pdfs.extend(self._PDFList.pdfs)
-            if self._PDFFile.pdf:
-               self.pdf.pdfs.append(self._PDFFile.pdf)
-            self.pdf.pdfs.sort()
+               pdfs.extend(self._PDFList.pdfs)
+            pdf_file = self._PDFFile.pdf
+            if pdf_file:
+               pdfs.append(pdf_file)
+            self.pdf.pdfs = pdfs # sorted, without double PDFs
         except:
             raise Exception("\n" + "\n ---> ERROR in update  PDFs list")
             return False
@@ -590,7 +662,7 @@ class JuMEG_PipelineLooper(JuMEG_PDF_BASE):
         if self.debug:
             logger.info("loading config file: {} ...".format(self.config_file) )
         with open(self.config_file,'r') as f:
-             self._config_data = yaml.full_load(f)
+             self._config_data = yaml.load(f,Loader=_YLoader)
         if self.debug:
             logger.info("DONE loading config file")
 
@@ -627,16 +699,9 @@ class JuMEG_PipelineLooper(JuMEG_PDF_BASE):
             """
             :param k: key in dict
             :param list of dicts:
-            :return: value of first match
+            :return: value of first match, values evaluating to False are skipped
             """
-            v=None
-            for obj in d:
-                if isinstance(obj,(dict)):
-                   if obj.get(k):
-                      v= obj.get(k)
-                     # logger.debug("---> TEST: {} => {}".format(k,v))
-                      return v
-            return v
+            return next( (obj[k] for obj in d if isinstance(obj,dict) and obj.get(k)),None )
     
         self.clear() # clear all pdf lists
         
@@ -662,7 +727,7 @@ class JuMEG_PipelineLooper(JuMEG_PDF_BASE):
            cfg_global = self.config.get("global")
            vlist.append(cfg_global)
            
-        logger.debug("config global parameter: {} ".format(cfg_global))
+        logger.debug("config global parameter: %s ",cfg_global)
         #logger.debug(" ---> value list parameter: {} ".format(vlist))
    
        #--- logfile
@@ -689,7 +754,7 @@ class JuMEG_PipelineLooper(JuMEG_PDF_BASE):
     def init_logfile(self,fname=None,mode="a"):
         if self.logoverwrite:
            mode="w"
-        self._Hlog = jumeg_logger.update_filehandler(logger=logger,fname=fname,path="./log",prefix=self.logprefix,name=os.path.splitext(self.pdf.name)[0],mode=mode)
+        self._Hlog = jumeg_logger.update_filehandler(logger=logger,fname=fname,path=os.path.join(self.pdf.dir,"log"),prefix=self.logprefix,name=os.path.splitext(self.pdf.name)[0],mode=mode)
     
     def file_list(self,**kwargs):
         """
@@ -701,8 +766,8 @@ class JuMEG_PipelineLooper(JuMEG_PDF_BASE):
             
         like a contexmanager in a loop
         loop over files in filelist
-        cd to file directory
-        provide filename, working dir
+        provide absolute filename, working dir
+        no chdir, the current working directory is not changed
         
         avoid copy/paste and boring repetitions
         place more error handling and file checking
@@ -720,7 +785,7 @@ class JuMEG_PipelineLooper(JuMEG_PDF_BASE):
            :param subject_ids    : string or list of strings e.g: subject ids
            :param file_extention : string or list  <None>
                                    if <file_extention> checks filename extention ends with extentio from list
-           :param recursive      : recursive searching for files in <stage/subject_id> using glob.iglob <False>
+           :param recursive      : recursive searching for files in <stage/subject_id> <False>
         
         -> Files from List
            :param list_filename : filename of list file
@@ -732,7 +797,7 @@ class JuMEG_PipelineLooper(JuMEG_PDF_BASE):
            :param fpath: path to filename
            
         :return:
-        filename,subject id,working dir
+        absolute filename,subject id,working dir (file directory)
     
          Example:
          --------
@@ -748,50 +813,64 @@ class JuMEG_PipelineLooper(JuMEG_PDF_BASE):
            logger.info("No files in list, stop process")
            return
         
-        logger.debug("PDF files to process: \n"+"\n".join(self.pdf.pdfs) )
+        if logger.isEnabledFor(logging.DEBUG):
+           logger.debug("PDF files to process: \n"+"\n".join(self.pdf.pdfs) )
         self._start_path = os.getcwd()
-        for self.pdf.idx in range( len( self.pdf.pdfs ) ):
+        pdf    = self.pdf
+        counts = pdf.counts
+        for idx in range( counts ):
+            pdf._idx = idx
+            pdf_name = pdf.name
+            pdf_id   = pdf.id
+            pdf_dir  = pdf.dir
+            pdf_file = pdf.file
             try:
-                with jb.working_directory(self.pdf.dir):
-                     msg = ["Start PreProc Ids: {}".format( self.pdf.counts ),
-                            " --> subject id       : {} file number: {} / {}".format(self.pdf.id,self.pdf.current_number,self.pdf.counts),
-                            "  -> raw file name    : {}".format(self.pdf.name),
-                            "  -> stage            : {}".format(self.stage),
-                            "  -> working dir      : {}".format(os.getcwd())]
-                     
-                     if not self.check_file_extention(self.pdf.name):
-                        msg.append("  -> Exit On Error:   : {}".format( self.ExitOnError) )
-                        msg.append("  -> error wrong file extention should be: {}".format( self.file_extention) )
-                        logger.error("\n".join(msg))
+                ext_ok = self.check_file_extention(pdf_name)
+               #--- build the info message only if it gets logged
+                msg = []
+                if not ext_ok or logger.isEnabledFor(logging.INFO):
+                   msg = ["Start PreProc Ids: {}".format( counts ),
+                          " --> subject id       : {} file number: {} / {}".format(pdf_id,idx + 1,counts),
+                          "  -> raw file name    : {}".format(pdf_name),
+                          "  -> stage            : {}".format(self.stage),
+                          "  -> recordings dir   : {}".format(pdf_dir)]
+                   if self.debug:
+                      msg.append("  -> working dir      : {}".format(os.getcwd()))
+                
+                if not ext_ok:
+                   msg.append("  -> Exit On Error:   : {}".format( self.ExitOnError) )
+                   msg.append("  -> error wrong file extention should be: {}".format( self.file_extention) )
+                   logger.error("\n".join(msg))
+                 
+                   if self.ExitOnError:
+                     raise Exception("\n"+"\n".join(msg))
+                   
+                if self.log2file:
+                   if self.logoverwrite:
+                      self.init_logfile( fname=os.path.splitext(pdf_name)[0] +".log" )
+                   else:
+                      self.init_logfile()
                       
-                        if self.ExitOnError:
-                          raise Exception("\n"+"\n".join(msg))
-                        
-                     if self.log2file:
-                        if self.logoverwrite:
-                           self.init_logfile( fname=os.path.splitext( self.pdf.name)[0] +".log" )
-                        else:
-                           self.init_logfile()
-                           
-                        msg.append("  -> writing log to   : {}".format(self.Hlog.filename))
-                     
-                     logger.info( "\n".join(msg) )
-                     
-                     try:
-                         yield self.pdf.name,self.pdf.id,self.pdf.dir
-                     except:
-                         logger.exception("ERROR subject : {}\n".format(self.pdf.id) +
-                                          "  -> recordings dir: {}\n".format(self.pdf.dir) +
-                                          "  -> file          : {}\n".format(self.pdf.name))
-                         return False
-                    
+                   msg.append("  -> writing log to   : {}".format(self.Hlog.filename))
+                
+                if msg:
+                   logger.info( "\n".join(msg) )
+                
+                try:
+                    yield pdf_file,pdf_id,pdf_dir
+                except:
+                    logger.exception("ERROR subject : {}\n".format(pdf_id) +
+                                     "  -> recordings dir: {}\n".format(pdf_dir) +
+                                     "  -> file          : {}\n".format(pdf_name))
+                    return False
+               
                 #--- do your stuff here
                 
                 if self._Hlog:
                    self._Hlog.close()
                    self._Hlog = None
             except:
-                logger.exception("ERROR subject : {}\n".format(self.pdf.id) )
+                logger.exception("ERROR subject : {}\n".format(pdf_id) )
                 if self.ExitOnError:
                     logger.error("\nExit On Error")
                     break
@@ -153,7 +153,7 @@ def apply_noise_reducer(raw_fname=None,raw=None,config=None,label='noise reducer
        CFG  = jCFG()
        data = None
        report_path   = os.path.dirname(fout)
-       report_config = os.path.join(report_path,raw_fname.rsplit("_",1)[0]+"-report.yaml")
+       report_config = os.path.join(report_path,os.path.basename(raw_fname).rsplit("_",1)[0]+"-report.yaml")
 
        if not CFG.load_cfg( fname=report_config ):
           data = {"noise_reducer":{ "files": os.path.basename(fout) } }
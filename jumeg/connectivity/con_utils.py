@@ -4,11 +4,73 @@
 
 import sys
 import os.path as op
+import warnings
+from functools import lru_cache
 import numpy as np
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
 import mne
 
 
-def find_distances_matrix(con, epochs, picks_epochs):
+@lru_cache(maxsize=None)
+def _get_cupy():
+    """Return the cupy module if it is installed and a GPU is usable."""
+    try:
+        import cupy
+    except ImportError as err:
+        warnings.warn('use_gpu=True but cupy can not be imported (%s), the '
+                      'distances are computed with scipy.' % err)
+        return None
+    if not cupy.cuda.is_available():
+        warnings.warn('use_gpu=True but no CUDA device is available, the '
+                      'distances are computed with scipy.')
+        return None
+    return cupy
+
+
+def _pdist_cupy(cp, coords):
+    """Euclidean distances between the rows of a (N, 3) array on the GPU."""
+    coords_gpu = cp.asarray(coords)
+    sq_norms = (coords_gpu * coords_gpu).sum(axis=1)
+    dist_sq = sq_norms[:, None] + sq_norms[None, :] - 2. * coords_gpu @ coords_gpu.T
+    dist = cp.sqrt(cp.maximum(dist_sq, 0.))
+    cp.fill_diagonal(dist, 0.)
+    return cp.asnumpy(dist)
+
+
+def _pairwise_distances(coords, use_gpu=False):
+    """Compute the Euclidean distance matrix of (N, 3) coordinates.
+
+    The distances are computed with scipy's cdist, or on the GPU with cupy
+    if use_gpu is True and a GPU is usable.
+    """
+    coords = np.ascontiguousarray(coords, dtype=np.float64)
+    if use_gpu:
+        cp = _get_cupy()
+        if cp is not None:
+            return _pdist_cupy(cp, coords)
+    return cdist(coords, coords)
+
+
+def _load_yaml(fname):
+    """Load a YAML file, with the libyaml C loader if available."""
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    with open(fname, 'r') as f:
+        return yaml.load(f, Loader=loader)
+
+
+@lru_cache(maxsize=4)
+def _load_surface(subject, hemi, surf, subjects_dir):
+    """Load and cache the geometry of a subject's surface."""
+    from surfer import Surface
+    surface = Surface(subject, hemi=hemi, surf=surf,
+                      subjects_dir=subjects_dir)
+    surface.load_geometry()
+    return surface
+
+
+def find_distances_matrix(con, epochs, picks_epochs, use_gpu=False):
 
     """Calculate distances between sensors.
 
@@ -24,6 +86,10 @@ def find_distances_matrix(con, epochs, picks_epochs):
         Instance of mne.Epochs
     picks_epochs : list
         Picks of epochs to be considered for analysis.
+    use_gpu : bool
+        If True, compute the distances on the GPU with cupy. This only pays
+        off for thousands of sensors, without cupy or a CUDA device scipy is
+        used. Default False.
 
     Returns:
     --------
@@ -31,15 +97,12 @@ def find_distances_matrix(con, epochs, picks_epochs):
          Connectivity distance matrix. Matrix of distances between various sensors.
 
     """
-    ch_names = epochs.ch_names
-    idx = [ch_names.index(name) for name in ch_names]
-    sens_loc = [epochs.info['chs'][picks_epochs[i]]['loc'][:3] for i in idx]
-    sens_loc = np.array(sens_loc)
-    con_dist = np.zeros(con.shape)
-    from scipy import linalg
-    for i in range(0, 31):
-        for j in range(0, 31):
-            con_dist[i][j] = linalg.norm(sens_loc[i] - sens_loc[j])
+    n_sens = con.shape[0]
+    # fill one contiguous (n_sens, 3) array
+    sens_loc = np.empty((n_sens, 3), dtype=np.float64)
+    for i in range(n_sens):
+        sens_loc[i] = epochs.info['chs'][picks_epochs[i]]['loc'][:3]
+    con_dist = _pairwise_distances(sens_loc, use_gpu=use_gpu)
     return con_dist
 
 
@@ -68,32 +131,51 @@ def weighted_con_matrix(con, epochs, picks_epochs, sigma=20):
     """
     con_dist = find_distances_matrix(con, epochs, picks_epochs)
 
-    con_dist_range = np.unique(con_dist.ravel())
+    # sorted unique distances and the index of each distance among them
+    con_dist_range, dist_indices = np.unique(con_dist.ravel(), return_inverse=True)
     # gaussian function for weighting, sigma - standard deviation
-    from scipy.signal import gaussian
-    gaussian_function = gaussian(con_dist_range.size * 2, sigma)[:con_dist_range.size]
+    # (left half of a gaussian window of twice the size, i.e., rising
+    # towards the window centre at n - 0.5)
+    n_dist = con_dist_range.size
+    gaussian_function = np.exp(-0.5 * ((np.arange(n_dist) - n_dist + 0.5) / sigma) ** 2)
     # Calculate the weights
     normalized_weights = (con_dist_range * gaussian_function) / np.sum(con_dist_range * gaussian_function)
-    # make a dictionary with distance and respective weights values
-    # d{sensor_distances:gaussian_normalized_weights}
-    d = {}
-    for i in range(0, con_dist_range.size):
-        d[con_dist_range[i]] = normalized_weights[i]
     # compute the distance weights matrix
-    dist_weights_matrix = np.zeros(con_dist.shape)
-    for j in range(0, con_dist.shape[0]):
-        for k in range(0, con_dist.shape[0]):
-            dist_weights_matrix[j][k] = d[con_dist[j][k]]
+    dist_weights_matrix = normalized_weights[dist_indices].reshape(con_dist.shape)
     # add the weights matrix to connectivity matrix to get the weighted connectivity matrix
     weighted_con_matrix = con + dist_weights_matrix
     return weighted_con_matrix
 
 
-def make_communities(con, top_n=3):
+def make_communities(con, top_n=3, density=None):
     """Make communities.
 
     Given an adjacency matrix, return list of nodes belonging to the top_n
-    communities based on Networkx Community algorithm.
+    communities based on the Louvain community detection algorithm.
+
+    If python-igraph is installed, its C implementation (multilevel) is
+    run directly on the edge list of the node pairs. Like nx.Graph(con), a
+    nonzero lower triangle entry gives the weight of a node pair, else the
+    upper triangle entry is used. A nonzero diagonal entry is kept as a
+    self-loop, as in nx.Graph(con). igraph does not accept negative weights,
+    graphs with negative weights are passed to networkx instead. Otherwise
+    the networkx implementation (networkx >= 2.7) is used if available,
+    else the python-louvain package.
+
+    Parameters:
+    -----------
+    con : ndarray (n_nodes x n_nodes)
+        Connectivity (adjacency) matrix.
+    top_n : int
+        Number of largest communities to return.
+    density : None | float
+        If given, only the strongest connections (by absolute value) making
+        up this proportion (0 < density <= 1) of all node pairs are kept
+        before detecting the communities. Negative weights are ranked by
+        their absolute value as well and are kept with their sign, kept
+        negative weights send the graph to networkx (see above). Sparser
+        graphs are much faster to partition. Default None, use all
+        connections.
 
     Returns:
     --------
@@ -103,20 +185,69 @@ def make_communities(con, top_n=3):
         Total number of communities found by the algorithm.
 
     """
-    import networkx as nx
-    import community
-    G = nx.Graph(con)
+    try:
+        import igraph
+    except ImportError:
+        igraph = None
+
+    n_nodes = con.shape[0]
+    # weight of each node pair in the upper triangle, a nonzero lower
+    # triangle entry wins and the diagonal gives self-loops like in nx.Graph(con)
+    upper = np.triu(con, k=1)
+    lower = np.tril(con, k=-1).T
+    pair_weights = np.where(lower != 0, lower, upper) + np.diag(np.diag(con))
+
+    if density is not None:
+        if not 0. < density <= 1.:
+            raise ValueError('density has to be in (0, 1], got %s' % density)
+        if n_nodes > 1:
+            # proportional threshold on the absolute weights of all node pairs
+            cut = np.quantile(np.abs(pair_weights[np.triu_indices(n_nodes, k=1)]),
+                              1. - density)
+            keep = np.abs(pair_weights) >= cut
+            pair_weights = np.where(keep, pair_weights, 0.)
+            con = np.where(keep | keep.T, con, 0.)
+
+    # apply the community detection algorithm, get the community of each node
+    if igraph is not None and not (pair_weights < 0).any():
+        # build the graph from the edge list, no networkx graph needed
+        rows, cols = np.nonzero(pair_weights)
+        G = igraph.Graph(n=n_nodes, edges=list(zip(rows.tolist(), cols.tolist())),
+                         edge_attrs={'weight': pair_weights[rows, cols]})
+        node_comms = np.asarray(G.community_multilevel(weights='weight').membership,
+                                dtype=np.int64)
+    else:
+        import networkx as nx
+        try:
+            from networkx.algorithms.community import louvain_communities
+        except ImportError:
+            louvain_communities = None
+        G = nx.Graph(con)
+
+        if louvain_communities is not None:
+            node_comms = np.empty(n_nodes, dtype=np.int64)
+            for comm_idx, comm in enumerate(louvain_communities(G)):
+                node_comms[list(comm)] = comm_idx
+        else:
+            import community
+            part = community.best_partition(G)
+            node_comms = np.fromiter((part[node_ind] for node_ind in range(n_nodes)),
+                                     dtype=np.int64, count=n_nodes)
+
+    comm_sizes = np.bincount(node_comms)
+    n_communities = int(np.count_nonzero(comm_sizes))
 
-    # apply the community detection algorithm
-    part = community.best_partition(G)
+    # the top_n largest communities, largest first
+    if 0 < top_n < comm_sizes.size:
+        top_comms = np.argpartition(-comm_sizes, top_n - 1)[:top_n]
+    else:
+        top_comms = np.arange(comm_sizes.size)[:max(top_n, 0)]
+    top_comms = top_comms[np.argsort(-comm_sizes[top_comms], kind='stable')]
 
-    from collections import Counter
-    top_communities = Counter(list(part.values())).most_common()[:top_n]
-    n_communities = len(Counter(list(part.values())))
-    # gets tuple (most_common, number_most_common)
-    top_nodes_list = []
-    for common, _ in top_communities:
-        top_nodes_list.append([node_ind for node_ind in part if part[node_ind] == common])
+    # group the nodes by community with a single sort
+    comm_nodes = np.split(np.argsort(node_comms, kind='stable'),
+                          np.cumsum(comm_sizes)[:-1])
+    top_nodes_list = [comm_nodes[comm].tolist() for comm in top_comms]
 
     # nx.draw_networkx(G, pos=nx.spring_layout(G), cmap=plt.get_cmap("jet"),
     #                  node_color=values, node_size=35, with_labels=False)
@@ -124,7 +255,7 @@ def make_communities(con, top_n=3):
     return top_nodes_list, n_communities
 
 
-def get_label_distances(subject, subjects_dir, parc='aparc'):
+def get_label_distances(subject, subjects_dir, parc='aparc', use_gpu=False):
     """Get Euclidean distance between label center of masses.
 
     Get the Euclidean distance between label center of mass and return the
@@ -139,6 +270,10 @@ def get_label_distances(subject, subjects_dir, parc='aparc'):
         The subjects directory.
     parc: str
         Name of the parcellation. Default 'aparc'.
+    use_gpu: bool
+        If True, compute the distances on the GPU with cupy. This only pays
+        off for thousands of labels, without cupy or a CUDA device scipy is
+        used. Default False.
 
     Return:
     -------
@@ -150,9 +285,6 @@ def get_label_distances(subject, subjects_dir, parc='aparc'):
         The centre of masses of labels in left and right hemispheres.
 
     """
-    import itertools
-    from scipy import linalg
-
     # get the labels
     aparc = mne.read_labels_from_annot(subject, subjects_dir=subjects_dir,
                                        parc=parc)
@@ -162,8 +294,9 @@ def get_label_distances(subject, subjects_dir, parc='aparc'):
     N = len(aparc)  # get the number of labels
 
     # get the center of mass of each of the labels and
-    coords_all, coms_lh, coms_rh = [], [], []
-    for mylab in aparc:
+    coords_all = np.empty((N, 3), dtype=np.float64)
+    coms_lh, coms_rh = [], []
+    for idx, mylab in enumerate(aparc):
         # now, split between hemispheres
         if mylab.name.endswith('-lh'):
             com_lh = mylab.center_of_mass(subject, subjects_dir=subjects_dir)
@@ -176,20 +309,15 @@ def get_label_distances(subject, subjects_dir, parc='aparc'):
                                         subjects_dir=subjects_dir)
             coms_rh.append(com_rh)
 
-        coords_all.append(coords_)
+        coords_all[idx] = np.ravel(coords_)
 
     # compute the distances
-    com_distances = np.zeros((N, N))
-    for (i, j) in itertools.combinations(list(range(N)), 2):
-        com_distances[i, j] = linalg.norm(coords_all[i] - coords_all[j])
-
-    # only one half matrix is created above, make it full
-    com_distances += com_distances.T
+    com_distances = _pairwise_distances(coords_all, use_gpu=use_gpu)
 
     rounded_com = np.round(com_distances, 0)
 
     # return the distance matrix rounded to nearest integer
-    return rounded_com, np.array(coords_all), coms_lh, coms_rh
+    return rounded_com, coords_all, coms_lh, coms_rh
 
 
 def make_annot_from_csv(subject, subjects_dir, csv_fname, lab_size=10,
@@ -229,47 +357,51 @@ def make_annot_from_csv(subject, subjects_dir, csv_fname, lab_size=10,
     import pandas as pd
     import matplotlib.cm as cmx
     import matplotlib.colors as colors
-    from surfer import (Surface, utils)
 
     surf = 'white'
     hemi = 'both'
 
     rsns = pd.read_csv(csv_fname, comment='#')
 
-    all_coords, all_labels = [], []
-    all_foci = []
+    # collect the seed nodes of all networks in csv order
+    seeds = []
     for netw in rsns.Network.unique():
-        print(netw, end=' ')
-        nodes = rsns[rsns.Network == netw]['Node'].values
-        for node in nodes:
-            mni_coords = rsns[(rsns.Network == netw) &
-                              (rsns.Node == node)].loc[:, ('x', 'y', 'z')].values[0]
-            all_coords.append(mni_coords)
-
-            hemi = rsns[(rsns.Network == netw) & (rsns.Node == node)].hemi.values[0]
-            print(node, ':', mni_coords, hemi, end=' ')
-
-            # but we are interested in getting the vertices and
-            # growing our own labels
-            foci_surf = Surface(subject, hemi=hemi, surf=surf,
-                                subjects_dir=subjects_dir)
-            foci_surf.load_geometry()
-            foci_vtxs = utils.find_closest_vertices(foci_surf.coords,
-                                                    mni_coords)
-            print('Closest vertex on surface chosen:', foci_vtxs)
-            all_foci.append(foci_vtxs)
-
-            if hemi == 'lh':
-                hemis = 0
-            else:
-                hemis = 1  # rh
-
-            lab_name = netw + '_' + node
-            mylabel = grow_labels(subject, foci_vtxs, extents=lab_size,
-                                  hemis=hemis, subjects_dir=subjects_dir,
-                                  n_jobs=n_jobs, overlap=True,
-                                  names=lab_name, surface=surf)[0]
-            all_labels.append(mylabel)
+        netw_rows = rsns[rsns.Network == netw]
+        for node, mni_coords, hemi in zip(netw_rows.Node.values,
+                                          netw_rows.loc[:, ('x', 'y', 'z')].values,
+                                          netw_rows.hemi.values):
+            seeds.append((netw, node, mni_coords, hemi))
+    all_coords = [mni_coords for _, _, mni_coords, _ in seeds]
+
+    # but we are interested in getting the vertices and
+    # growing our own labels: query the closest surface vertices of all
+    # seeds of a hemisphere at once using a KD-tree of the surface
+    all_foci = [None] * len(seeds)
+    for hemi in np.unique([seed[3] for seed in seeds]):
+        seed_indices = [idx for idx, seed in enumerate(seeds) if seed[3] == hemi]
+        foci_surf = _load_surface(subject, hemi, surf, subjects_dir)
+        _, foci_vtxs = cKDTree(foci_surf.coords).query(
+            np.array([all_coords[idx] for idx in seed_indices]))
+        for idx, foci_vtx in zip(seed_indices, foci_vtxs):
+            all_foci[idx] = np.atleast_1d(foci_vtx)
+
+    all_hemis, all_names = [], []
+    for (netw, node, mni_coords, hemi), foci_vtxs in zip(seeds, all_foci):
+        print(netw, node, ':', mni_coords, hemi, end=' ')
+        print('Closest vertex on surface chosen:', foci_vtxs)
+
+        if hemi == 'lh':
+            all_hemis.append(0)
+        else:
+            all_hemis.append(1)  # rh
+        all_names.append(netw + '_' + node)
+
+    # grow all labels in one go, with overlap=True the labels are
+    # returned in the order of the seeds
+    all_labels = grow_labels(subject, all_foci, extents=[lab_size] * len(seeds),
+                             hemis=all_hemis, subjects_dir=subjects_dir,
+                             n_jobs=n_jobs, overlap=True,
+                             names=all_names, surface=surf)
 
     # assign colours to the labels
     # labels within the same network get the same color
@@ -290,7 +422,7 @@ def make_annot_from_csv(subject, subjects_dir, csv_fname, lab_size=10,
         return all_labels, all_coords, all_foci
 
 
-def expand_con_matrix(con, label_names, full_label_names):
+def expand_con_matrix(con, label_names, full_label_names, validate=False):
     """Expand the dimensions of the connectivity matrix.
 
     The dimensions are expaded from
@@ -307,6 +439,9 @@ def expand_con_matrix(con, label_names, full_label_names):
     full_label_names : list
         Full list containing all label names to be included in the
         expanded connectivity matrix.
+    validate : bool
+        If True, check that the expanded matrix reproduces con at the
+        label indices. Default False.
 
     Returns:
     --------
@@ -314,31 +449,25 @@ def expand_con_matrix(con, label_names, full_label_names):
         The full connectivity matrix after expansion.
 
     """
-    assert len(con.shape) == 2, 'The con matrix is not 2D.'
-    assert con.shape[0] == con.shape[1], 'The con matrix is not square.'
-    assert con.shape[0] == len(label_names), 'Number of labels and con matrix shape do not match.'
+    assert con.ndim == 2, 'The con matrix is not 2D.'
+    n_rows, n_cols = con.shape
+    assert n_rows == n_cols, 'The con matrix is not square.'
+    assert n_rows == len(label_names), 'Number of labels and con matrix shape do not match.'
 
-    full_label_names_arr = np.asarray(full_label_names)
+    # index of the first occurrence of each name in full_label_names
+    full_label_idx = {}
+    for idx, ln in enumerate(full_label_names):
+        full_label_idx.setdefault(ln, idx)
 
-    lbl_indices = []
-    for ln in label_names:
-        lbl_indices.append(np.where(full_label_names_arr == ln)[0][0])
-    lbl_indices = np.asarray(lbl_indices)
-
-    if len(label_names) != len(lbl_indices):
+    if not all(ln in full_label_idx for ln in label_names):
         raise RuntimeError('Not all labels could be matched.')
 
-    con_exp = np.zeros((len(full_label_names), len(full_label_names)))
-
-    for ii in range(lbl_indices.shape[0]):
-
-        for jj in range(lbl_indices.shape[0]):
-            idxi = lbl_indices[ii]
-            idxj = lbl_indices[jj]
+    lbl_indices = np.asarray([full_label_idx[ln] for ln in label_names])
 
-            con_exp[idxi, idxj] = con[ii, jj]
+    con_exp = np.zeros((len(full_label_names), len(full_label_names)))
+    con_exp[np.ix_(lbl_indices, lbl_indices)] = con
 
-    if not np.allclose(con_exp[lbl_indices][:, lbl_indices], con):
+    if validate and not np.allclose(con_exp[np.ix_(lbl_indices, lbl_indices)], con):
         raise RuntimeError('Expansion failed.')
 
     return con_exp
@@ -368,9 +497,7 @@ def group_con_matrix_by_lobe(con, label_names, grouping_yaml_fname):
     assert con.shape[0] == len(label_names), 'Number of labels and con matrix shape do not match.'
 
     if op.isfile(grouping_yaml_fname):
-        import yaml
-        with open(grouping_yaml_fname, 'r') as f:
-            groupings = yaml.safe_load(f)
+        groupings = _load_yaml(grouping_yaml_fname)
     else:
         print('%s - File not found.' % grouping_yaml_fname)
         sys.exit()
@@ -379,6 +506,12 @@ def group_con_matrix_by_lobe(con, label_names, grouping_yaml_fname):
     # Get the indices of the labels belonging to the lobes
     ###########################################################################
 
+    # split the label names once into name stem and hemisphere
+    label_stems = [label_name[:-3] for label_name in label_names]
+    label_hemis = [label_name[-3:] for label_name in label_names]
+    if not all(hemi in ('-lh', '-rh') for hemi in label_hemis):
+        raise RuntimeError('Label is neither left nor right hemisphere.')
+
     full_grouping_labels = []
     grouping_labels = []
     grouping_indices = []
@@ -388,16 +521,13 @@ def group_con_matrix_by_lobe(con, label_names, grouping_yaml_fname):
             grp_indices_lh = []
             grp_indices_rh = []
 
-            for label_name in label_names:
-
-                if not (label_name.endswith('-lh') or label_name.endswith('-rh')):
-                    raise RuntimeError('Label is neither left nor right hemisphere.')
-
-                if label_name[:-3] in grouping[key]:
-                    if label_name.endswith('-lh'):
-                        grp_indices_lh.append(label_names.index(label_name))
+            members = set(grouping[key])
+            for idx, stem in enumerate(label_stems):
+                if stem in members:
+                    if label_hemis[idx] == '-lh':
+                        grp_indices_lh.append(idx)
                     else:
-                        grp_indices_rh.append(label_names.index(label_name))
+                        grp_indices_rh.append(idx)
 
             if len(grp_indices_lh) > 0:
                 grouping_labels.append(key + '-lh')
@@ -409,25 +539,20 @@ def group_con_matrix_by_lobe(con, label_names, grouping_yaml_fname):
             full_grouping_labels.extend([key + '-lh', key + '-rh'])
 
     ###########################################################################
-    # Create the grouping by lobe in two steps
+    # Create the grouping by lobe with a group membership matrix
     ###########################################################################
 
     # ensure that diagonal values are 0 before summing
     con = con.copy()
     np.fill_diagonal(con, 0)
 
-    # first sum up across rows
-    # then sum up across columns
+    # membership[g, i] is 1 if label i belongs to group g, summing up
+    # across rows and columns is then membership @ con @ membership.T
+    membership = np.zeros((len(grouping_labels), con.shape[0]))
+    for idx, grp_indices in enumerate(grouping_indices):
+        membership[idx, grp_indices] = 1.
 
-    con_row = np.empty(shape=(len(grouping_labels), con.shape[1]))
-    for idx in range(len(grouping_indices)):
-        grp_indices = grouping_indices[idx]
-        con_row[idx] = con[grp_indices].sum(axis=0)
-
-    con_grp = np.empty(shape=(len(grouping_labels), len(grouping_labels)))
-    for idx in range(len(grouping_indices)):
-        grp_indices = grouping_indices[idx]
-        con_grp[:, idx] = con_row[:, grp_indices].sum(axis=1)
+    con_grp = membership @ con @ membership.T
 
     con_grp_exp = expand_con_matrix(con_grp, grouping_labels, full_grouping_labels)
 
@@ -456,10 +581,12 @@ def generate_random_connectivity_matrix(size=(68, 68), symmetric=False,
 
     """
     rng = np.random.RandomState(random_state)
-    con = rng.normal(loc=0.5, scale=0.2, size=size)
-    con[(con <= 0.) | (con > 1.)] = 0.  # make 0 < con < 1
-    con[np.diag_indices_from(con)] = 0.  # zero diagonal
-    con[np.triu_indices_from(con)] = 0.  # zero upper half
+    # only sample the strict lower half, diagonal and upper half stay zero
+    tril_idx = np.tril_indices(size[0], k=-1, m=size[1])
+    vals = rng.normal(loc=0.5, scale=0.2, size=tril_idx[0].size)
+    vals[(vals <= 0.) | (vals > 1.)] = 0.  # make 0 < con < 1
+    con = np.zeros(size)
+    con[tril_idx] = vals
     if symmetric:
         return con + con.T
     else:
@@ -468,12 +595,10 @@ def generate_random_connectivity_matrix(size=(68, 68), symmetric=False,
 
 def load_grouping_dict(grouping):
     """Load cortex or cluster based grouping information."""
-    import yaml
     if isinstance(grouping, str):
         # read the yaml file with grouping
         if op.isfile(grouping):
-            with open(grouping, 'r') as f:
-                my_groups = yaml.safe_load(f)
+            my_groups = _load_yaml(grouping)
         else:
             print('%s - File not found.' % grouping)
             sys.exit()